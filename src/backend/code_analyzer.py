@@ -3,51 +3,197 @@ Code analysis module for reviewing code quality, security, and best practices
 """
 
 import ast
+import codecs
 import re
 import asyncio
-from typing import List, Dict, Any
-from models import PRData, PRAnalysisResponse, CodeFeedback, FeedbackType
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from models import PRData, PRAnalysisResponse, CodeFeedback, FeedbackType, Finding
 import subprocess
 import tempfile
 import os
 
+try:
+    # RE2 matches in linear time, so diff content can't trigger catastrophic backtracking
+    import re2 as re_engine
+except ImportError:
+    re_engine = re
+
+def _web_concurrency() -> int:
+    """
+    Number of uvicorn workers sharing the machine, defaulting to 1 when
+    WEB_CONCURRENCY is unset or not a positive integer
+    """
+    try:
+        return max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+    except ValueError:
+        return 1
+
 class CodeAnalyzer:
+    _CODE_EXTS = ('.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go')
+
+    # Smaller PRs are analyzed on a single thread; below these sizes the cost of
+    # handing work to other processes outweighs the parallel speedup
+    PARALLEL_MIN_FILES = 4
+    PARALLEL_MIN_DIFF_SIZE = 200_000
+
+    # Caps that keep memory and latency bounded on pathological (e.g. generated) PRs
+    MAX_FEEDBACK = 2000
+    MAX_LINES_PER_FILE = 10_000
+
     def __init__(self):
+        # Patterns are written in lower case and matched against the lower-cased
+        # line, which makes them case-insensitive without IGNORECASE. Each one
+        # carries the literals any match must contain; lines are checked for
+        # those substrings first, and the regex only runs when one is present -
+        # most added lines contain none of them. Checks that are plain
+        # substring tests have no pattern at all.
         self.security_patterns = [
-            (r'eval\s*\(', "Avoid using eval() as it can execute arbitrary code"),
-            (r'exec\s*\(', "Avoid using exec() as it can execute arbitrary code"),
-            (r'subprocess\.call\s*\(.*shell\s*=\s*True', "Avoid shell=True in subprocess calls"),
-            (r'sql.*\+.*', "Potential SQL injection - use parameterized queries"),
-            (r'password\s*=\s*["\'][^"\']*["\']', "Hardcoded password detected"),
-            (r'api_key\s*=\s*["\'][^"\']*["\']', "Hardcoded API key detected"),
+            (r'eval\s*\(', "Avoid using eval() as it can execute arbitrary code", ('eval',)),
+            (r'exec\s*\(', "Avoid using exec() as it can execute arbitrary code", ('exec',)),
+            (r'subprocess\.call\s*\(.*shell\s*=\s*true', "Avoid shell=True in subprocess calls", ('subprocess.call',)),
+            (r'sql.*\+', "Potential SQL injection - use parameterized queries", ('sql',)),
+            (r'password\s*=\s*["\'][^"\']*["\']', "Hardcoded password detected", ('password',)),
+            (r'api_key\s*=\s*["\'][^"\']*["\']', "Hardcoded API key detected", ('api_key',)),
         ]
         
         self.quality_patterns = [
-            (r'def\s+\w+\([^)]*\):\s*$', "Function missing docstring"),
-            (r'class\s+\w+.*:\s*$', "Class missing docstring"),
-            (r'print\s*\(', "Consider using logging instead of print statements"),
-            (r'TODO|FIXME|HACK', "TODO/FIXME comment found - consider addressing"),
+            (r'def\s+\w+\([^)]*\):\s*$', "Function missing docstring", ('def',)),
+            (r'class\s+\w+.*:\s*$', "Class missing docstring", ('class',)),
+            (r'print\s*\(', "Consider using logging instead of print statements", ('print',)),
+            (None, "TODO/FIXME comment found - consider addressing", ('todo', 'fixme', 'hack')),
+        ]
+
+        # Compile once into a single rule table; scanning is the hot path
+        # (every rule x every added line) and each rule carries its own
+        # classification, so a hit maps straight to a finding
+        self._line_rules = (
+            self._compile_rules(self.security_patterns, FeedbackType.ERROR, 5)
+            + self._compile_rules(self.quality_patterns, FeedbackType.WARNING, 3)
+        )
+        self._def_re = re_engine.compile(r'def\s+\w+\([^)]*\):')
+
+        # RE2 has no lookahead, so the diff splitter always uses the stdlib engine
+        self._diff_re = re.compile(r'^diff --git(.*)$|^\+(?!\+\+)(.*)$', re.MULTILINE)
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @staticmethod
+    def _compile_rules(patterns: List[Tuple[Optional[str], str, Tuple[str, ...]]],
+                       feedback_type: FeedbackType, severity: int) -> List[Tuple]:
+        """
+        Compile (pattern, message, literals) entries into
+        (literals, regex, type, severity, message) rules
+        """
+        return [
+            (literals, re_engine.compile(pattern) if pattern else None, feedback_type, severity, message)
+            for pattern, message, literals in patterns
         ]
     
     async def analyze_changes(self, pr_data: PRData) -> PRAnalysisResponse:
         """
         Analyze the PR changes and generate feedback
         """
-        feedback = []
+        # Parsing and scanning are CPU-bound; keep them off the event loop
+        diff_sections = await asyncio.to_thread(self._parse_diff, pr_data.diff_content)
+        code_files = [
+            (file_path, changes) for file_path, changes in diff_sections.items()
+            if self._is_code_file(file_path)
+        ]
         
-        # Parse diff and analyze each file
-        diff_sections = self._parse_diff(pr_data.diff_content)
+        # Files are analyzed independently, so large PRs with more than one code
+        # file fan out across processes; a single file gains nothing from the pool
+        if len(code_files) > 1 and (len(code_files) > self.PARALLEL_MIN_FILES
+                                    or len(pr_data.diff_content) > self.PARALLEL_MIN_DIFF_SIZE):
+            # Only the lines that will be scanned are pickled to the workers. Each
+            # file may still return up to MAX_FEEDBACK + 1 findings, trimmed only
+            # after gathering, so peak memory here grows with the number of files
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(
+                    pool, _analyze_file_in_worker, file_path, changes[:self.MAX_LINES_PER_FILE]
+                )
+                for file_path, changes in code_files
+            ))
+        else:
+            results = await asyncio.to_thread(self._analyze_files, code_files)
+        
+        findings = list(itertools.chain.from_iterable(results))
+        
+        # Files past the per-file line cap are only partially scanned
+        capped_files = sum(1 for _, changes in code_files if len(changes) > self.MAX_LINES_PER_FILE)
+        
+        return self._build_response(pr_data, findings, capped_files)
+    
+    def close(self):
+        """
+        Shut down the worker processes, if any were started
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """
+        Lazily create the process pool used for large PRs
+        """
+        if self._pool is None:
+            # Split the CPUs between uvicorn workers (uvicorn takes its worker count
+            # from WEB_CONCURRENCY) instead of every worker sizing a pool for all of them
+            web_workers = _web_concurrency()
+            # Forking a process that already runs threads (to_thread, aiohttp's
+            # resolver) can deadlock the child on inherited locks, so workers are
+            # started fresh and import _analyze_file_in_worker themselves
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(
+                max_workers=max(1, (os.cpu_count() or 1) // web_workers),
+                mp_context=multiprocessing.get_context(start_method)
+            )
+        return self._pool
+    
+    def _analyze_files(self, code_files: List[Tuple[str, List[str]]]) -> List[List[Finding]]:
+        """
+        Analyze each file's changes in the current thread
+        """
+        results = []
+        total = 0
+        for file_path, changes in code_files:
+            # Only stop once the cap is exceeded, so hitting it exactly isn't
+            # mistaken for a truncated analysis
+            if total > self.MAX_FEEDBACK:
+                break
+            file_feedback = self._analyze_file_changes(file_path, changes)
+            results.append(file_feedback)
+            total += len(file_feedback)
+        return results
+    
+    def _build_response(self, pr_data: PRData, findings: List[Finding],
+                        capped_files: int = 0) -> PRAnalysisResponse:
+        """
+        Score and summarize the collected findings
+        """
+        truncated = len(findings) > self.MAX_FEEDBACK
+        if truncated:
+            findings = findings[:self.MAX_FEEDBACK]
         
-        for file_path, changes in diff_sections.items():
-            if self._is_code_file(file_path):
-                file_feedback = await self._analyze_file_changes(file_path, changes)
-                feedback.extend(file_feedback)
+        stats = self._collect_stats(findings)
         
         # Calculate overall score
-        score = self._calculate_score(feedback)
+        score = self._calculate_score(stats)
         
         # Generate summary
-        summary = self._generate_summary(pr_data, feedback, score)
+        summary = self._generate_summary(pr_data, stats, score, truncated, capped_files)
+        
+        # Findings are built by the analyzer itself, so skip re-validating each one
+        feedback = [
+            CodeFeedback.model_construct(
+                file=f.file, line=f.line, type=f.type, message=f.message, severity=f.severity
+            )
+            for f in findings
+        ]
         
         return PRAnalysisResponse(
             score=score,
@@ -56,7 +202,7 @@ class CodeAnalyzer:
             files_changed=len(pr_data.files_changed),
             lines_added=pr_data.additions,
             lines_removed=pr_data.deletions,
-            recommendations=self._generate_recommendations(feedback)
+            recommendations=self._generate_recommendations(stats, capped_files)
         )
     
     def _parse_diff(self, diff_content: str) -> Dict[str, List[str]]:
@@ -64,111 +210,98 @@ class CodeAnalyzer:
         Parse git diff content and extract changes per file
         """
         files = {}
-        current_file = None
-        current_changes = []
-        
-        for line in diff_content.split('\n'):
-            if line.startswith('diff --git'):
-                if current_file:
-                    files[current_file] = current_changes
-                # Extract filename
-                parts = line.split(' ')
-                current_file = parts[-1][2:]  # Remove 'b/' prefix
+        current_changes = None
+        
+        # One C-level scan picks out just the file headers (group 1) and added
+        # lines (group 2); every other line of the diff is skipped by the engine
+        for match in self._diff_re.finditer(diff_content):
+            if match.lastindex == 1:
+                # Every header starts a new section; lines of a file whose path
+                # can't be parsed are collected but dropped
                 current_changes = []
-            elif line.startswith('+') and not line.startswith('+++'):
-                current_changes.append(line[1:])  # Remove '+' prefix
+                file_path = self._diff_header_path(match.group(1))
+                if file_path is not None:
+                    files[file_path] = current_changes
+            elif current_changes is not None:
+                current_changes.append(match.group(2))
         
-        if current_file:
-            files[current_file] = current_changes
-            
         return files
     
+    @staticmethod
+    def _diff_header_path(header: str) -> Optional[str]:
+        """
+        Extract the new-side path from the rest of a 'diff --git' header line,
+        unquoting it if git quoted it (non-ASCII or special characters)
+        """
+        header = header.strip()
+        if header.endswith('"'):
+            start = header.rfind(' "')
+            if start == -1:
+                return None
+            # Git quotes C-style, with octal escapes for each byte of the UTF-8 path
+            raw = codecs.escape_decode(header[start + 2:-1].encode('utf-8'))[0]
+            path = raw.decode('utf-8', 'replace')
+        else:
+            start = header.rfind(' b/')
+            if start == -1:
+                return None
+            path = header[start + 1:]
+        
+        return path[2:] if path.startswith('b/') else None
+    
     def _is_code_file(self, file_path: str) -> bool:
         """
         Check if the file is a code file that should be analyzed
         """
-        code_extensions = ['.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.cs', '.php', '.rb', '.go']
-        return any(file_path.endswith(ext) for ext in code_extensions)
+        return file_path.endswith(self._CODE_EXTS)
     
-    async def _analyze_file_changes(self, file_path: str, changes: List[str]) -> List[CodeFeedback]:
+    def _analyze_file_changes(self, file_path: str, changes: List[str]) -> List[Finding]:
         """
         Analyze changes in a specific file
         """
         feedback = []
+        is_python = file_path.endswith('.py')
         
-        for line_num, line_content in enumerate(changes, 1):
-            # Security analysis
-            security_issues = self._check_security_patterns(line_content)
-            for issue in security_issues:
-                feedback.append(CodeFeedback(
-                    file=file_path,
-                    line=line_num,
-                    type=FeedbackType.ERROR,
-                    message=issue,
-                    severity=5
-                ))
+        # Files with more added lines than this are almost certainly generated
+        for line_num, line_content in enumerate(itertools.islice(changes, self.MAX_LINES_PER_FILE), 1):
+            if len(feedback) > self.MAX_FEEDBACK:
+                break
             
-            # Code quality analysis
-            quality_issues = self._check_quality_patterns(line_content)
-            for issue in quality_issues:
-                feedback.append(CodeFeedback(
-                    file=file_path,
-                    line=line_num,
-                    type=FeedbackType.WARNING,
-                    message=issue,
-                    severity=3
-                ))
+            # Security and code quality analysis; lower-case once per line, the
+            # original text is kept for the length checks and Python analysis
+            line_lower = line_content.lower()
+            for literals, pattern, feedback_type, severity, message in self._line_rules:
+                # Skip the regex unless one of the rule's required literals is present
+                if (any(literal in line_lower for literal in literals)
+                        and (pattern is None or pattern.search(line_lower))):
+                    feedback.append(Finding(file_path, line_num, feedback_type, message, severity))
             
             # Python-specific analysis
-            if file_path.endswith('.py'):
-                python_issues = await self._analyze_python_line(line_content)
+            if is_python:
+                python_issues = self._analyze_python_line(line_content)
                 for issue in python_issues:
-                    feedback.append(CodeFeedback(
-                        file=file_path,
-                        line=line_num,
-                        type=issue['type'],
-                        message=issue['message'],
-                        severity=issue['severity']
+                    feedback.append(Finding(
+                        file_path, line_num, issue['type'], issue['message'], issue['severity']
                     ))
         
         return feedback
     
-    def _check_security_patterns(self, line: str) -> List[str]:
-        """
-        Check line against security patterns
-        """
-        issues = []
-        for pattern, message in self.security_patterns:
-            if re.search(pattern, line, re.IGNORECASE):
-                issues.append(message)
-        return issues
-    
-    def _check_quality_patterns(self, line: str) -> List[str]:
-        """
-        Check line against code quality patterns
-        """
-        issues = []
-        for pattern, message in self.quality_patterns:
-            if re.search(pattern, line, re.IGNORECASE):
-                issues.append(message)
-        return issues
-    
-    async def _analyze_python_line(self, line: str) -> List[Dict]:
+    def _analyze_python_line(self, line: str) -> List[Dict]:
         """
         Python-specific code analysis
         """
         issues = []
         
         # Check for missing type hints
-        if re.match(r'def\s+\w+\([^)]*\):', line) and '->' not in line:
+        if self._def_re.match(line) and '->' not in line:
             issues.append({
                 'type': FeedbackType.SUGGESTION,
                 'message': 'Consider adding type hints for better code clarity',
                 'severity': 2
             })
         
-        # Check for long lines
-        if len(line.strip()) > 88:
+        # Check for long lines (only strip lines that could exceed the limit)
+        if len(line) > 88 and len(line.strip()) > 88:
             issues.append({
                 'type': FeedbackType.WARNING,
                 'message': 'Line exceeds recommended length (88 characters)',
@@ -185,34 +318,47 @@ class CodeAnalyzer:
         
         return issues
     
-    def _calculate_score(self, feedback: List[CodeFeedback]) -> int:
+    def _collect_stats(self, findings: List[Finding]) -> Dict[str, float]:
         """
-        Calculate overall code quality score based on feedback
+        Tally everything the score, summary and recommendations need in one pass
         """
-        if not feedback:
-            return 100
+        stats = {'error': 0, 'warning': 0, 'penalty': 0.0, 'security': 0, 'docstring': 0}
         
-        total_penalty = 0
-        for item in feedback:
+        for item in findings:
             if item.type == FeedbackType.ERROR:
-                total_penalty += item.severity * 3
+                stats['error'] += 1
+                stats['penalty'] += item.severity * 3
             elif item.type == FeedbackType.WARNING:
-                total_penalty += item.severity * 2
+                stats['warning'] += 1
+                stats['penalty'] += item.severity * 2
             elif item.type == FeedbackType.SUGGESTION:
-                total_penalty += item.severity * 1
+                stats['penalty'] += item.severity * 1
             else:  # INFO
-                total_penalty += item.severity * 0.5
+                stats['penalty'] += item.severity * 0.5
+            
+            message = item.message.lower()
+            if 'security' in message or 'injection' in message:
+                stats['security'] += 1
+            if 'docstring' in message:
+                stats['docstring'] += 1
         
+        return stats
+    
+    def _calculate_score(self, stats: Dict[str, float]) -> int:
+        """
+        Calculate overall code quality score based on feedback
+        """
         # Calculate score (max penalty of 100)
-        score = max(0, 100 - min(100, total_penalty))
+        score = max(0, 100 - min(100, stats['penalty']))
         return int(score)
     
-    def _generate_summary(self, pr_data: PRData, feedback: List[CodeFeedback], score: int) -> str:
+    def _generate_summary(self, pr_data: PRData, stats: Dict[str, float], score: int,
+                          truncated: bool = False, capped_files: int = 0) -> str:
         """
         Generate a summary of the analysis
         """
-        error_count = len([f for f in feedback if f.type == FeedbackType.ERROR])
-        warning_count = len([f for f in feedback if f.type == FeedbackType.WARNING])
+        error_count = stats['error']
+        warning_count = stats['warning']
         
         summary = f"Analysis of PR with {pr_data.files_changed} files changed "
         summary += f"({pr_data.additions} additions, {pr_data.deletions} deletions). "
@@ -228,28 +374,46 @@ class CodeAnalyzer:
             summary += f"Found {error_count} critical issues that should be fixed. "
         if warning_count > 0:
             summary += f"Found {warning_count} warnings to consider. "
+        if truncated:
+            summary += f"Analysis truncated after {self.MAX_FEEDBACK} findings. "
+        if capped_files > 0:
+            summary += (f"Only the first {self.MAX_LINES_PER_FILE} added lines were analyzed "
+                        f"in {capped_files} file(s); the remaining lines were not reviewed. ")
         
         return summary
     
-    def _generate_recommendations(self, feedback: List[CodeFeedback]) -> List[str]:
+    def _generate_recommendations(self, stats: Dict[str, float], capped_files: int = 0) -> List[str]:
         """
         Generate actionable recommendations based on feedback
         """
         recommendations = []
         
-        error_count = len([f for f in feedback if f.type == FeedbackType.ERROR])
-        if error_count > 0:
+        if stats['error'] > 0:
             recommendations.append("Address all critical security and error issues before merging")
         
-        security_issues = len([f for f in feedback if 'security' in f.message.lower() or 'injection' in f.message.lower()])
-        if security_issues > 0:
+        if stats['security'] > 0:
             recommendations.append("Review and fix security vulnerabilities")
         
-        doc_issues = len([f for f in feedback if 'docstring' in f.message.lower()])
-        if doc_issues > 0:
+        if stats['docstring'] > 0:
             recommendations.append("Add documentation to improve code maintainability")
         
+        if capped_files > 0:
+            recommendations.append("Manually review the added lines that exceeded the analysis limit before merging")
+        
         if not recommendations:
             recommendations.append("Great work! Code looks good to merge.")
         
-        return recommendations
\ No newline at end of file
+        return recommendations
+
+
+# Analyzer used by pool worker processes, created on first use in each worker
+_worker_analyzer: Optional[CodeAnalyzer] = None
+
+def _analyze_file_in_worker(file_path: str, changes: List[str]) -> List[Finding]:
+    """
+    Process pool entry point for analyzing a single file's changes
+    """
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        _worker_analyzer = CodeAnalyzer()
+    return _worker_analyzer._analyze_file_changes(file_path, changes)
\ No newline at end of file
@@ -2,21 +2,38 @@
 Git integration module for fetching PR data from various Git platforms
 """
 
-import git
 import requests
-import os
-import tempfile
-import shutil
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from urllib.parse import urlparse
 from models import PRData
 import asyncio
 import aiohttp
 
+# Largest page size the GitHub REST API allows
+GITHUB_PAGE_SIZE = 100
+
 class GitService:
     def __init__(self):
-        self.temp_dir = None
+        self._session: Optional[aiohttp.ClientSession] = None
         
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Return the shared HTTP session, creating it on first use so connections
+        (and their TLS handshakes) are reused across requests
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=50, ttl_dns_cache=300, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+    
+    async def close(self):
+        """
+        Close the shared HTTP session
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
     async def fetch_pr_data(self, repository_url: str, pr_number: int) -> PRData:
         """
         Fetch pull request data from the repository
@@ -44,22 +61,20 @@ class GitService:
         
         api_url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}"
         
-        async with aiohttp.ClientSession() as session:
-            # Get PR metadata
-            async with session.get(api_url) as response:
-                if response.status != 200:
-                    raise Exception(f"Failed to fetch PR data: {response.status}")
-                pr_data = await response.json()
-            
-            # Get PR files and diff
-            files_url = f"{api_url}/files"
-            async with session.get(files_url) as response:
-                if response.status != 200:
-                    raise Exception(f"Failed to fetch PR files: {response.status}")
-                files_data = await response.json()
+        session = await self._get_session()
+        
+        # Get PR metadata, files and the unified diff concurrently; the diff comes
+        # straight from the API instead of cloning the repository
+        pr_data, files_data, diff_content = await asyncio.gather(
+            self._get_json(session, api_url, "PR data"),
+            self._get_pr_files(session, f"{api_url}/files"),
+            self._get_pr_diff(session, api_url)
+        )
         
-        # Clone repository and get diff
-        diff_content = await self._get_pr_diff(repository_url, pr_data['head']['sha'], pr_data['base']['sha'])
+        if diff_content is None:
+            # GitHub won't render the diff of very large PRs; rebuild it from the
+            # per-file patches (files GitHub omits a patch for are left out)
+            diff_content = self._diff_from_patches(files_data)
         
         return PRData(
             files_changed=[f['filename'] for f in files_data],
@@ -68,9 +83,66 @@ class GitService:
             commits=pr_data['commits'],
             diff_content=diff_content,
             branch_name=pr_data['head']['ref'],
-            base_branch=pr_data['base']['ref']
+            base_branch=pr_data['base']['ref'],
+            head_sha=pr_data['head']['sha']
         )
     
+    async def _get_json(self, session: aiohttp.ClientSession, url: str, what: str) -> Any:
+        """
+        GET a JSON resource, raising if the request fails
+        """
+        async with session.get(url) as response:
+            if response.status != 200:
+                raise Exception(f"Failed to fetch {what}: {response.status}")
+            return await response.json()
+    
+    async def _get_pr_files(self, session: aiohttp.ClientSession, files_url: str) -> List[Dict[str, Any]]:
+        """
+        GET every page of a PR's file list
+        """
+        files = []
+        page = 1
+        while True:
+            page_data = await self._get_json(
+                session, f"{files_url}?per_page={GITHUB_PAGE_SIZE}&page={page}", "PR files"
+            )
+            files.extend(page_data)
+            if len(page_data) < GITHUB_PAGE_SIZE:
+                return files
+            page += 1
+    
+    async def _get_pr_diff(self, session: aiohttp.ClientSession, api_url: str) -> Optional[str]:
+        """
+        GET the PR's unified diff, or None if GitHub refuses it as too large (406)
+        """
+        async with session.get(api_url, headers={"Accept": "application/vnd.github.v3.diff"}) as response:
+            if response.status == 406:
+                return None
+            if response.status != 200:
+                raise Exception(f"Failed to fetch PR diff: {response.status}")
+            return await response.text()
+    
+    @staticmethod
+    def _diff_from_patches(files_data: List[Dict[str, Any]]) -> str:
+        """
+        Assemble a unified diff from the 'patch' fields of a PR's file list
+        """
+        sections = []
+        for f in files_data:
+            patch = f.get('patch')
+            if not patch:
+                # Binary files, and files GitHub considers too large to show
+                continue
+            new_path = f['filename']
+            old_path = f.get('previous_filename', new_path)
+            sections.append(
+                f"diff --git a/{old_path} b/{new_path}\n"
+                f"--- a/{old_path}\n"
+                f"+++ b/{new_path}\n"
+                f"{patch}\n"
+            )
+        return "".join(sections)
+    
     async def _fetch_gitlab_pr(self, repository_url: str, pr_number: int) -> PRData:
         """
         Fetch PR data from GitLab API (Merge Request)
@@ -84,32 +156,4 @@ class GitService:
         Fetch PR data from Bitbucket API
         """
         # Implementation for Bitbucket
-        raise NotImplementedError("Bitbucket integration coming soon")
-    
-    async def _get_pr_diff(self, repository_url: str, head_sha: str, base_sha: str) -> str:
-        """
-        Clone repository and get diff between commits
-        """
-        try:
-            # Create temporary directory
-            self.temp_dir = tempfile.mkdtemp()
-            
-            # Clone repository
-            repo = git.Repo.clone_from(str(repository_url), self.temp_dir)
-            
-            # Get diff between commits
-            diff = repo.git.diff(base_sha, head_sha)
-            
-            return diff
-            
-        except Exception as e:
-            raise Exception(f"Failed to get diff: {str(e)}")
-        finally:
-            # Cleanup
-            if self.temp_dir and os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir)
-    
-    def __del__(self):
-        """Cleanup temporary directory"""
-        if self.temp_dir and os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
\ No newline at end of file
+        raise NotImplementedError("Bitbucket integration coming soon")
\ No newline at end of file
@@ -6,10 +6,12 @@ Copy this to a separate Python project to run the backend.
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 import uvicorn
 from typing import List, Optional
 import asyncio
+from cachetools import TTLCache
 
 # Import custom modules (create these files separately)
 from git_integration import GitService
@@ -19,7 +21,9 @@ from models import PRAnalysisRequest, PRAnalysisResponse, CodeFeedback
 app = FastAPI(
     title="PR Review Agent API",
     description="AI-powered Pull Request Review System",
-    version="1.0.0"
+    version="1.0.0",
+    # Responses can carry thousands of feedback items; orjson serializes them much faster
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS for frontend
@@ -35,6 +39,15 @@ app.add_middleware(
 git_service = GitService()
 code_analyzer = CodeAnalyzer()
 
+# Analysis results keyed by (repository_url, pr_number, head_sha); a PR whose head
+# hasn't moved analyzes identically, so repeated polls skip the analysis
+analysis_cache: TTLCache = TTLCache(maxsize=256, ttl=600)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await git_service.close()
+    code_analyzer.close()
+
 @app.get("/")
 async def root():
     return {"message": "PR Review Agent API is running"}
@@ -51,9 +64,19 @@ async def analyze_pull_request(request: PRAnalysisRequest):
             pr_number=request.pr_number
         )
         
+        cache_key = (str(request.repository_url), request.pr_number, pr_data.head_sha)
+        if pr_data.head_sha:
+            # Single lookup: an entry can expire between a membership test and a read
+            cached = analysis_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         # Analyze the code changes
         analysis_result = await code_analyzer.analyze_changes(pr_data)
         
+        if pr_data.head_sha:
+            analysis_cache[cache_key] = analysis_result
+        
         return analysis_result
         
     except Exception as e:
@@ -5,6 +5,7 @@ Data models for the PR Review Agent
 from pydantic import BaseModel, HttpUrl
 from typing import List, Optional, Literal
 from enum import Enum
+from dataclasses import dataclass
 
 class FeedbackType(str, Enum):
     ERROR = "error"
@@ -24,6 +25,16 @@ class CodeFeedback(BaseModel):
     severity: int  # 1-5 scale
     suggestion: Optional[str] = None
 
+# Lightweight counterpart of CodeFeedback used inside the analyzer; converted to
+# CodeFeedback once, when the response is built
+@dataclass(frozen=True, slots=True)
+class Finding:
+    file: str
+    line: int
+    type: FeedbackType
+    message: str
+    severity: int  # 1-5 scale
+
 class PRData(BaseModel):
     files_changed: List[str]
     additions: int
@@ -32,6 +43,7 @@ class PRData(BaseModel):
     diff_content: str
     branch_name: str
     base_branch: str
+    head_sha: Optional[str] = None
 
 class PRAnalysisResponse(BaseModel):
     score: int  # 0-100
@@ -0,0 +1,39 @@
+from code_analyzer import CodeAnalyzer
+
+
+def test_parse_diff_quoted_path_starts_new_section():
+    diff = (
+        'diff --git a/ok.py b/ok.py\n'
+        '--- a/ok.py\n'
+        '+++ b/ok.py\n'
+        '+x = 1\n'
+        'diff --git "a/caf\\303\\251.txt" "b/caf\\303\\251.txt"\n'
+        '--- "a/caf\\303\\251.txt"\n'
+        '+++ "b/caf\\303\\251.txt"\n'
+        '+password = "hunter2"\n'
+        '+eval(data)\n'
+    )
+
+    files = CodeAnalyzer()._parse_diff(diff)
+
+    assert files == {
+        'ok.py': ['x = 1'],
+        'café.txt': ['password = "hunter2"', 'eval(data)'],
+    }
+
+
+def test_parse_diff_drops_lines_of_unparseable_header():
+    diff = (
+        'diff --git a/ok.py b/ok.py\n'
+        '+x = 1\n'
+        'diff --git garbage\n'
+        '+eval(data)\n'
+    )
+
+    assert CodeAnalyzer()._parse_diff(diff) == {'ok.py': ['x = 1']}
+
+
+def test_parse_diff_path_with_spaces():
+    diff = 'diff --git a/my file.py b/my file.py\n+q = 1\n'
+
+    assert CodeAnalyzer()._parse_diff(diff) == {'my file.py': ['q = 1']}